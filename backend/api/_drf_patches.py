@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import copy
+
+from rest_framework.serializers import ModelSerializer
+
+_FIELD_CACHE: dict[type, dict] = {}
+_original_get_fields = ModelSerializer.get_fields
+
+
+def _cached_get_fields(self):
+    cls = self.__class__
+    fields = _FIELD_CACHE.get(cls)
+    if fields is None:
+        fields = _FIELD_CACHE[cls] = _original_get_fields(self)
+    return copy.deepcopy(fields)
+
+
+def patch_model_serializer_fields() -> None:
+    if ModelSerializer.get_fields is not _cached_get_fields:
+        ModelSerializer.get_fields = _cached_get_fields
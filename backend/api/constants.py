@@ -1,6 +1,11 @@
 DEFAULT_PAGE_SIZE = 6
 MAX_PAGE_SIZE = 20
 PAGE_SIZE_QUERY_PARAM = "limit"
+COUNT_CACHE_TTL = 300
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
+INGREDIENTS_BATCH_SIZE = 500
 
 MIN_AMOUNT = 1
 MIN_COOKING_TIME = 1
@@ -9,5 +14,10 @@ BASE62_ALPHABET = (
     "0123456789abcdefghijklmnopqrstuvwxyz"
     "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 )
+SHORTLINK_CACHE_SIZE = 10_000
+SHORTLINK_CACHE_TTL = 300
+
+TAGS_CACHE_TTL = 300
+INGREDIENTS_CACHE_TTL = 300
 
 FRONT_RECIPE_PATH = "/recipes/{id}"
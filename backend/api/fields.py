@@ -1,15 +1,42 @@
 from __future__ import annotations
 
-import base64
 import binascii
 import uuid
 from io import BytesIO
-from typing import Any
+from typing import Any, Optional, Tuple
+
+try:
+    import pybase64 as base64
+except ImportError:  # pragma: no cover
+    import base64
 
 from django.core.files.base import ContentFile
-from PIL import Image, UnidentifiedImageError
 from rest_framework import serializers
 
+from api.constants import MAX_IMAGE_BYTES
+from api.utils import absolute_url
+
+_MAGIC = (
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    for prefix, fmt in _MAGIC:
+        if head.startswith(prefix):
+            return fmt
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def _decode_and_sniff(raw_b64: str) -> Tuple[bytes, Optional[str]]:
+    decoded = base64.b64decode(raw_b64.encode("ascii"), validate=True)
+    return decoded, _sniff(decoded[:12])
+
 
 class SmartImageField(serializers.ImageField):
     default_error_messages = {
@@ -30,32 +57,15 @@ class SmartImageField(serializers.ImageField):
             return super().to_internal_value(data)
 
         if isinstance(data, str):
-            data = data.strip()
-            if not data:
-                self.fail("invalid_image")
-
-            if data.startswith("data:image"):
-                try:
-                    _, b64data = data.split(",", 1)
-                except ValueError:
-                    self.fail("not_base64")
-                raw_b64 = b64data.strip()
-            else:
-                raw_b64 = data
+            raw_b64 = self._base64_payload(data)
 
             try:
-                decoded_bytes = base64.b64decode(raw_b64, validate=True)
+                decoded_bytes, fmt = _decode_and_sniff(raw_b64)
             except (binascii.Error, ValueError):
                 self.fail("not_base64")
 
-            try:
-                with Image.open(BytesIO(decoded_bytes)) as img:
-                    fmt = (img.format or "").lower()
-            except (UnidentifiedImageError, OSError):
-                self.fail("invalid_image")
-
-            if fmt == "jpeg":
-                fmt = "jpg"
+            if fmt is None:
+                fmt = self._pillow_format(decoded_bytes)
 
             if fmt not in self._ALLOWED_FORMATS:
                 self.fail("invalid_type")
@@ -65,3 +75,48 @@ class SmartImageField(serializers.ImageField):
             return super().to_internal_value(content)
 
         self.fail("invalid_image")
+
+    def _base64_payload(self, data: str) -> str:
+        if data[:32].lstrip().startswith("data:image"):
+            comma = data.find(",")
+            if comma < 0:
+                self.fail("not_base64")
+            raw_b64 = data[comma + 1:].strip()
+        else:
+            raw_b64 = data.strip()
+
+        if not raw_b64:
+            self.fail("invalid_image")
+
+        size = len(raw_b64)
+        if size & 3:
+            self.fail("not_base64")
+        if (size * 3) >> 2 > MAX_IMAGE_BYTES:
+            self.fail("invalid_image")
+        return raw_b64
+
+    def _pillow_format(self, decoded_bytes: bytes) -> str:
+        from PIL import Image, UnidentifiedImageError
+
+        try:
+            with Image.open(BytesIO(decoded_bytes)) as img:
+                fmt = (img.format or "").lower()
+        except (UnidentifiedImageError, OSError):
+            self.fail("invalid_image")
+        return "jpg" if fmt == "jpeg" else fmt
+
+
+class AbsoluteImageField(serializers.ImageField):
+    def __init__(self, *, empty_value=None, **kwargs):
+        kwargs.setdefault("read_only", True)
+        self.empty_value = empty_value
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        value = super().get_attribute(instance)
+        return self.empty_value if value is None else value
+
+    def to_representation(self, value):
+        if not value:
+            return self.empty_value
+        return absolute_url(self.context.get("request"), value.url)
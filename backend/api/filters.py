@@ -1,7 +1,64 @@
-from django.db.models import Case, IntegerField, QuerySet, Value, When
+import time
+from functools import lru_cache
+
+from django.db.models import (
+    BooleanField,
+    Case,
+    Exists,
+    IntegerField,
+    OuterRef,
+    QuerySet,
+    Value,
+    When,
+)
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django_filters import rest_framework as filters
+from django_filters.fields import MultipleChoiceField
+
+from api.constants import TAGS_CACHE_TTL
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+
+
+@lru_cache(maxsize=1)
+def _tag_snapshot(ttl_bucket: int) -> tuple:
+    rows = tuple(Tag.objects.order_by('id').values('id', 'name', 'slug'))
+    return rows, {row['slug']: row['id'] for row in rows}
+
+
+def tag_snapshot(refresh: bool = False) -> tuple:
+    """Return all tags as (rows in id order, {slug: id})."""
+    if refresh:
+        _tag_snapshot.cache_clear()
+    return _tag_snapshot(int(time.monotonic() // TAGS_CACHE_TTL))
+
+
+def tag_rows() -> tuple:
+    return tag_snapshot()[0]
+
+
+def tag_ids_by_slug(refresh: bool = False) -> dict:
+    return tag_snapshot(refresh)[1]
+
+
+def _tag_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug()]
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def reset_tag_cache(sender, **kwargs):
+    _tag_snapshot.cache_clear()
+
 
-from recipes.models import Ingredient, Recipe, Tag
+class TagSlugField(MultipleChoiceField):
+    def validate(self, value):
+        if not set(value) <= tag_ids_by_slug().keys():
+            tag_ids_by_slug(refresh=True)
+        super().validate(value)
+
+
+class TagSlugFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugField
 
 
 class RecipeFilter(filters.FilterSet):
@@ -11,10 +68,9 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart', label='В корзине покупок'
     )
-    tags = filters.ModelMultipleChoiceFilter(
+    tags = TagSlugFilter(
         field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+        choices=_tag_choices,
         method='filter_tags',
         label='Теги рецепта',
     )
@@ -32,14 +88,45 @@ class RecipeFilter(filters.FilterSet):
         )
 
     def filter_tags(self, queryset: QuerySet, name: str, values) -> QuerySet:
-        if not values:
+        ids_by_slug = tag_ids_by_slug()
+        tag_ids = [ids_by_slug[slug] for slug in values if slug in ids_by_slug]
+        if not tag_ids:
             return queryset
-        try:
-            tag_ids = list(values.values_list('id', flat=True))
-            return queryset.filter(tags__id__in=tag_ids).distinct()
-        except Exception:
-            slugs = [getattr(v, 'slug', v) for v in values]
-            return queryset.filter(tags__slug__in=slugs).distinct()
+        queryset = queryset.filter(tags__id__in=tag_ids)
+        return queryset if len(tag_ids) == 1 else queryset.distinct()
+
+    @classmethod
+    def annotate_user_flags(cls, queryset: QuerySet, user) -> QuerySet:
+        if not (user and user.is_authenticated):
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        favorites = Favorite.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ).only('pk')
+        cart = ShoppingCart.objects.filter(
+            user=user, recipe=OuterRef('pk')
+        ).only('pk')
+        return queryset.annotate(
+            is_favorited=Exists(favorites),
+            is_in_shopping_cart=Exists(cart),
+        )
+
+    def _filter_user_flag(
+            self,
+            queryset: QuerySet,
+            flag: str,
+            value
+    ) -> QuerySet:
+        if value is not True:
+            return queryset
+        user = getattr(getattr(self, 'request', None), 'user', None)
+        if not (user and user.is_authenticated):
+            return queryset
+        if flag not in queryset.query.annotations:
+            queryset = self.annotate_user_flags(queryset, user)
+        return queryset.filter(**{flag: True})
 
     def filter_is_favorited(
             self,
@@ -47,20 +134,14 @@ class RecipeFilter(filters.FilterSet):
             name: str,
             value
     ) -> QuerySet:
-        user = getattr(getattr(self, 'request', None), 'user', None)
-        if value and user and user.is_authenticated:
-            return queryset.filter(favorites__user=user).distinct()
-        return queryset
+        return self._filter_user_flag(queryset, 'is_favorited', value)
 
     def filter_is_in_shopping_cart(
             self,
             queryset: QuerySet,
             name: str, value
     ) -> QuerySet:
-        user = getattr(getattr(self, 'request', None), 'user', None)
-        if value and user and user.is_authenticated:
-            return queryset.filter(shopping_recipe__user=user).distinct()
-        return queryset
+        return self._filter_user_flag(queryset, 'is_in_shopping_cart', value)
 
 
 class IngredientFilter(filters.FilterSet):
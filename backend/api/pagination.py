@@ -1,9 +1,72 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from types import MethodType
+from urllib.parse import urlencode
 
-from .constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PAGE_SIZE_QUERY_PARAM
+from django.core.cache import cache
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from .constants import (
+    COUNT_CACHE_TTL,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    PAGE_SIZE_QUERY_PARAM,
+)
 
 
 class DefaultPagination(PageNumberPagination):
     page_size = DEFAULT_PAGE_SIZE
     page_size_query_param = PAGE_SIZE_QUERY_PARAM
     max_page_size = MAX_PAGE_SIZE
+
+
+class CachedCountPagination(DefaultPagination):
+    """Page-number pagination that reuses the COUNT between pages.
+
+    Page 1 always counts and stores the result; later pages of the same
+    listing (same path, filters and user) reuse it for up to
+    ``count_cache_timeout`` seconds. The cache is the configured Django
+    cache, per process by default, so ``count`` and ``next``/``previous``
+    on later pages may lag rows added or removed since page 1 was loaded
+    in that process, by at most that window.
+    """
+
+    count_cache_timeout = COUNT_CACHE_TTL
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = request.query_params.get(self.page_query_param, "1")
+        queryset = self._with_cached_count(
+            queryset, self._count_cache_key(request), refresh=page == "1"
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def _count_cache_key(self, request):
+        skip = {self.page_query_param, self.page_size_query_param}
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+            if name not in skip
+        )
+        raw = f"{request.path}|{request.user.pk}|{urlencode(params, True)}"
+        return "count:" + hashlib.sha1(raw.encode()).hexdigest()
+
+    def _with_cached_count(self, queryset, key, refresh):
+        timeout = self.count_cache_timeout
+        count = type(queryset).count
+
+        def cached_count(qs):
+            value = None if refresh else cache.get(key)
+            if value is None:
+                value = count(qs)
+                cache.set(key, value, timeout)
+            return value
+
+        queryset = queryset.all()
+        queryset.count = MethodType(cached_count, queryset)
+        return queryset
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = DEFAULT_PAGE_SIZE
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    max_page_size = MAX_PAGE_SIZE
+    ordering = "-id"
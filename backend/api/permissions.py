@@ -3,6 +3,8 @@ from typing import Any
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.request import Request
 
+_SAFE_METHODS = frozenset(SAFE_METHODS)
+
 
 def is_admin_user(user: Any) -> bool:
     return bool(
@@ -15,6 +17,14 @@ def is_admin_user(user: Any) -> bool:
     )
 
 
+def _is_admin_request(request: Request) -> bool:
+    cached = getattr(request, "_is_admin", None)
+    if cached is None:
+        cached = is_admin_user(getattr(request, "user", None))
+        request._is_admin = cached
+    return cached
+
+
 class IsAuthorOrReadOnly(BasePermission):
     def has_object_permission(
         self,
@@ -22,14 +32,14 @@ class IsAuthorOrReadOnly(BasePermission):
         view: Any,
         obj: Any,
     ) -> bool:
-        if request.method in SAFE_METHODS:
+        if request.method in _SAFE_METHODS:
             return True
 
-        user = getattr(request, "user", None)
-
-        if is_admin_user(user):
+        if _is_admin_request(request):
             return True
 
+        user = getattr(request, "user", None)
+
         if not getattr(user, "is_authenticated", False):
             return False
 
@@ -43,14 +53,14 @@ class IsOwnerOrAdmin(BasePermission):
         view: Any,
         obj: Any,
     ) -> bool:
-        if request.method in SAFE_METHODS:
+        if request.method in _SAFE_METHODS:
             return True
 
-        user = getattr(request, "user", None)
-
-        if is_admin_user(user):
+        if _is_admin_request(request):
             return True
 
+        user = getattr(request, "user", None)
+
         if not getattr(user, "is_authenticated", False):
             return False
 
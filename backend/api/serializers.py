@@ -1,18 +1,36 @@
+import hashlib
 import logging
+from collections import defaultdict
+from functools import cached_property
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
-from django.db import IntegrityError, transaction
-from django.db.models import Q
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import (
+    BooleanField,
+    Count,
+    Exists,
+    F,
+    Manager,
+    OuterRef,
+    Subquery,
+    Value,
+    Window,
+)
+from django.db.models.functions import Coalesce, Lower, RowNumber
 
 from djoser.serializers import (
     TokenCreateSerializer as DjoserTokenCreateSerializer,
 )
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
 
-from api.constants import MIN_AMOUNT
+from api.constants import (
+    INGREDIENTS_BATCH_SIZE,
+    MIN_AMOUNT,
+    MIN_COOKING_TIME,
+)
+from api.fields import AbsoluteImageField, SmartImageField
+from api.utils import absolute_url
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -27,10 +45,49 @@ from users.models import Profile, User
 
 logger = logging.getLogger(__name__)
 
+USER_INFO_COLUMNS = (
+    "id",
+    "username",
+    "first_name",
+    "last_name",
+    "email",
+    "profile__avatar",
+)
+
+RECIPE_READ_COLUMNS = (
+    "id",
+    "author",
+    "name",
+    "image",
+    "text",
+    "cooking_time",
+)
 
-class UserInfoSerializer(serializers.ModelSerializer):
+
+class RequestUserMixin:
+    @cached_property
+    def request_user(self):
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return user
+
+
+def shopping_cart_size(user_ref):
+    cart_size = (
+        ShoppingCart.objects.filter(user=user_ref)
+        .order_by()
+        .values("user")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return Coalesce(Subquery(cart_size), 0)
+
+
+class UserInfoSerializer(RequestUserMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
-    avatar = serializers.SerializerMethodField()
+    avatar = AbsoluteImageField(source="profile.avatar", empty_value="")
     shopping_cart_count = serializers.SerializerMethodField()
 
     class Meta:
@@ -47,21 +104,47 @@ class UserInfoSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    @classmethod
+    def setup_eager_loading(cls, queryset, user=None):
+        queryset = (
+            queryset.select_related("profile")
+            .only(*USER_INFO_COLUMNS)
+            .annotate(shopping_cart_size=shopping_cart_size(OuterRef("pk")))
+        )
+        if user is None:
+            return queryset
+        if not user.is_authenticated:
+            flag = Value(False, output_field=BooleanField())
+        else:
+            flag = Exists(
+                Subscription.objects.filter(user=user, author=OuterRef("pk"))
+            )
+        return queryset.annotate(is_subscribed_flag=flag)
+
+    def to_representation(self, instance):
+        cache = self.context.setdefault("_user_cache", {})
+        key = (type(self), instance.pk)
+        data = cache.get(key)
+        if data is None:
+            data = cache[key] = super().to_representation(instance)
+        return data
+
     def get_is_subscribed(self, obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or user.is_anonymous:
+        flag = getattr(obj, "is_subscribed_flag", None)
+        if flag is not None:
+            return flag
+        user = self.request_user
+        if user is None:
             return False
+        subscribed_ids = self.context.get("subscribed_ids")
+        if subscribed_ids is not None:
+            return obj.id in subscribed_ids
         return Subscription.objects.filter(user=user, author=obj).exists()
 
-    def get_avatar(self, obj):
-        request = self.context.get("request")
-        if hasattr(obj, "profile") and obj.profile.avatar:
-            url = obj.profile.avatar.url
-            return request.build_absolute_uri(url) if request else url
-        return ""
-
     def get_shopping_cart_count(self, obj):
+        size = getattr(obj, "shopping_cart_size", None)
+        if size is not None:
+            return size
         return ShoppingCart.objects.filter(user=obj).count()
 
 
@@ -110,7 +193,7 @@ class UserCreateSerializer(serializers.ModelSerializer):
         val = (value or "").strip().lower()
         if not val:
             raise serializers.ValidationError("Укажите email.")
-        if User.objects.filter(email__iexact=val).exists():
+        if User.objects.filter(email=val).exists():
             raise serializers.ValidationError(
                 "Пользователь с таким email уже существует."
             )
@@ -144,19 +227,38 @@ class UserCreateSerializer(serializers.ModelSerializer):
 
 
 class SetUserAvatarSerializer(serializers.ModelSerializer):
-    avatar = serializers.ImageField(required=True, help_text="Изображение")
+    avatar = SmartImageField(required=True, help_text="Изображение")
 
     class Meta:
         model = Profile
         fields = ("avatar",)
 
     def update(self, instance, validated_data):
-        if instance.avatar:
-            instance.avatar.delete(save=False)
-        instance.avatar = validated_data["avatar"]
+        avatar = validated_data["avatar"]
+        old = instance.avatar
+        if old and self._same_content(old, avatar):
+            return instance
+        old_name, storage = old.name, old.storage
+        instance.avatar = avatar
         instance.save(update_fields=["avatar"])
+        if old_name and old_name != instance.avatar.name:
+            transaction.on_commit(lambda: storage.delete(old_name))
         return instance
 
+    @staticmethod
+    def _same_content(current, upload):
+        try:
+            if current.size != upload.size:
+                return False
+            with current.open("rb") as stored:
+                stored_digest = hashlib.sha256(stored.read()).digest()
+        except OSError:
+            return False
+        upload.seek(0)
+        upload_digest = hashlib.sha256(upload.read()).digest()
+        upload.seek(0)
+        return stored_digest == upload_digest
+
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -170,16 +272,6 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = ("id", "name", "measurement_unit")
         read_only_fields = ("id", "name", "measurement_unit")
-        validators = [
-            UniqueTogetherValidator(
-                queryset=Ingredient.objects.all(),
-                fields=("name", "measurement_unit"),
-                message=(
-                    "Ингредиент с такой парой (name, measurement_unit) уже "
-                    "существует."
-                ),
-            )
-        ]
 
 
 class RecipeIngredientReadSerializer(serializers.Serializer):
@@ -190,26 +282,28 @@ class RecipeIngredientReadSerializer(serializers.Serializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(min_value=MIN_AMOUNT)
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
-    image = serializers.SerializerMethodField()
+def short_recipe_data(recipe, request):
+    image = recipe.image
+    return {
+        "id": recipe.id,
+        "name": recipe.name,
+        "image": absolute_url(request, image.url) if image else None,
+        "cooking_time": recipe.cooking_time,
+    }
 
+
+class RecipeShortSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
         read_only_fields = fields
 
-    def get_image(self, obj):
-        request = self.context.get("request")
-        if obj.image:
-            url = obj.image.url
-            return request.build_absolute_uri(url) if request else url
-        return None
+    def to_representation(self, instance):
+        return short_recipe_data(instance, self.context.get("request"))
 
 
 class SetPasswordSerializer(serializers.Serializer):
@@ -233,13 +327,86 @@ class SetPasswordSerializer(serializers.Serializer):
         return value
 
 
+def ingredients_by_recipe(recipe_ids):
+    rows = (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by("id")
+        .values_list(
+            "recipe_id",
+            "ingredient_id",
+            "ingredient__name",
+            "ingredient__measurement_unit",
+            "amount",
+        )
+    )
+    grouped = defaultdict(list)
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        grouped[recipe_id].append(
+            {
+                "id": ingredient_id,
+                "name": name,
+                "measurement_unit": unit,
+                "amount": amount,
+            }
+        )
+    return grouped
+
+
+def user_relation_rows(user, recipe_ids, with_subscriptions=True):
+    favorites = (
+        Favorite.objects.filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=Value("f"))
+        .values_list("recipe_id", "kind")
+    )
+    cart = (
+        ShoppingCart.objects.filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=Value("c"))
+        .values_list("recipe_id", "kind")
+    )
+    if not with_subscriptions:
+        return favorites.union(cart, all=True)
+    subscriptions = (
+        Subscription.objects.filter(user=user)
+        .annotate(kind=Value("s"))
+        .values_list("author_id", "kind")
+    )
+    return subscriptions.union(favorites, cart, all=True)
+
+
+class RecipeListSerializer(RequestUserMixin, serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        recipe_ids = [recipe.pk for recipe in recipes]
+        grouped = ingredients_by_recipe(recipe_ids)
+        for recipe in recipes:
+            recipe._ingredients_data = grouped.get(recipe.pk, [])
+        if recipes and not hasattr(recipes[0], "is_favorited"):
+            self._attach_user_flags(recipes, recipe_ids)
+        return super().to_representation(recipes)
+
+    def _attach_user_flags(self, recipes, recipe_ids):
+        user = self.request_user
+        buckets = {"s": set(), "f": set(), "c": set()}
+        if user is not None:
+            with_subscriptions = "subscribed_ids" not in self.context
+            for obj_id, kind in user_relation_rows(
+                user, recipe_ids, with_subscriptions
+            ):
+                buckets[kind].add(obj_id)
+            if with_subscriptions:
+                self.context["subscribed_ids"] = frozenset(buckets["s"])
+        for recipe in recipes:
+            recipe.is_favorited = recipe.pk in buckets["f"]
+            recipe.is_in_shopping_cart = recipe.pk in buckets["c"]
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     author = UserInfoSerializer(read_only=True)
-    tags = TagSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
-    image = serializers.SerializerMethodField()
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    image = AbsoluteImageField()
 
     class Meta:
         model = Recipe
@@ -256,47 +423,33 @@ class RecipeSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
         read_only_fields = fields
+        list_serializer_class = RecipeListSerializer
 
-    def _through_qs(self, recipe):
-        through = Recipe.ingredients.through
-        return through.objects.filter(
-            recipe=recipe
-        ).select_related("ingredient")
+    def to_representation(self, instance):
+        size = getattr(instance, "author_cart_size", None)
+        if size is not None:
+            instance.author.shopping_cart_size = size
+        return super().to_representation(instance)
 
-    def get_ingredients(self, obj):
+    def get_tags(self, obj):
+        cache = self.context.setdefault("_tag_cache", {})
         data = []
-        for ri in self._through_qs(obj):
-            ing = ri.ingredient
-            data.append(
-                {
-                    "id": ing.id,
-                    "name": ing.name,
-                    "measurement_unit": ing.measurement_unit,
-                    "amount": ri.amount,
+        for tag in obj.tags.all():
+            item = cache.get(tag.pk)
+            if item is None:
+                item = cache[tag.pk] = {
+                    "id": tag.pk,
+                    "name": tag.name,
+                    "slug": tag.slug,
                 }
-            )
+            data.append(item)
         return data
 
-    def get_is_favorited(self, obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or user.is_anonymous:
-            return False
-        return Favorite.objects.filter(user=user, recipe=obj).exists()
-
-    def get_is_in_shopping_cart(self, obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
-
-    def get_image(self, obj):
-        request = self.context.get("request")
-        if obj.image:
-            url = obj.image.url
-            return request.build_absolute_uri(url) if request else url
-        return None
+    def get_ingredients(self, obj):
+        data = getattr(obj, "_ingredients_data", None)
+        if data is None:
+            data = ingredients_by_recipe([obj.pk]).get(obj.pk, [])
+        return data
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -307,7 +460,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     author = UserInfoSerializer(read_only=True)
     id = serializers.ReadOnlyField()
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    image = Base64ImageField(required=True)
+    image = SmartImageField(required=True)
 
     class Meta:
         model = Recipe
@@ -327,7 +480,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             "name": {"required": True, "allow_blank": False},
             "text": {"required": True, "allow_blank": False},
             "image": {"required": True, "allow_null": False},
-            "cooking_time": {"required": True, "min_value": 1},
+            "cooking_time": {
+                "required": True,
+                "min_value": MIN_COOKING_TIME,
+            },
         }
 
     def validate_image(self, value):
@@ -368,12 +524,28 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Нужно указать минимум 1 ингредиент."
             )
-        ingredient_ids = [i["id"].id for i in data.get("ingredients")]
-        if len(ingredient_ids) != len(set(ingredient_ids)):
+        ingredients = data["ingredients"]
+        ingredient_ids = {item["id"] for item in ingredients}
+        if len(ingredient_ids) != len(ingredients):
             logger.error("Duplicate ingredients detected")
             raise serializers.ValidationError(
                 "Ингредиенты должны быть уникальны."
             )
+        missing = ingredient_ids.difference(
+            Ingredient.objects.filter(pk__in=ingredient_ids).values_list(
+                "pk", flat=True
+            )
+        )
+        if missing:
+            logger.error("Unknown ingredients: %s", sorted(missing))
+            raise serializers.ValidationError(
+                {
+                    "ingredients": [
+                        "Ингредиенты не найдены: "
+                        f'{", ".join(map(str, sorted(missing)))}.'
+                    ]
+                }
+            )
         name = data.get("name")
         author = self.context["request"].user
         if Recipe.objects.filter(author=author, name=name).exists():
@@ -387,21 +559,54 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
         return data
 
-    @transaction.atomic
-    def tags_and_ingredients_set(self, recipe, tags, ingredients):
-        logger.debug("Setting tags: %s, ingredients: %s", tags, ingredients)
-        recipe.tags.set(tags)
+    def _create_ingredients(self, recipe, ingredients):
         RecipeIngredient.objects.bulk_create(
             [
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient_id=ingredient["id"].id,
+                    ingredient_id=ingredient["id"],
                     amount=ingredient["amount"],
                 )
                 for ingredient in ingredients
-            ]
+            ],
+            batch_size=INGREDIENTS_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def _update_ingredients(self, recipe, ingredients):
+        amounts = {item["id"]: item["amount"] for item in ingredients}
+        existing = {
+            ri.ingredient_id: ri
+            for ri in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        stale = [
+            ri.pk
+            for ingredient_id, ri in existing.items()
+            if ingredient_id not in amounts
+        ]
+        if stale:
+            RecipeIngredient.objects.filter(pk__in=stale).delete()
+        changed = []
+        for ingredient_id, ri in existing.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and ri.amount != amount:
+                ri.amount = amount
+                changed.append(ri)
+        if changed:
+            RecipeIngredient.objects.bulk_update(
+                changed, ["amount"], batch_size=INGREDIENTS_BATCH_SIZE
+            )
+        self._create_ingredients(
+            recipe,
+            [item for item in ingredients if item["id"] not in existing],
         )
 
+    @transaction.atomic
+    def tags_and_ingredients_set(self, recipe, tags, ingredients):
+        logger.debug("Setting tags: %s, ingredients: %s", tags, ingredients)
+        recipe.tags.set(tags)
+        self._create_ingredients(recipe, ingredients)
+
     @transaction.atomic
     def create(self, validated_data):
         logger.debug("Creating recipe with data: %s", validated_data)
@@ -420,22 +625,80 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         logger.debug(
             "Updating recipe %s with data: %s", instance.id, validated_data
         )
-        tags = validated_data.pop("tags")
-        ingredients = validated_data.pop("ingredients")
+        tags = validated_data.pop("tags", None)
+        ingredients = validated_data.pop("ingredients", None)
         instance = super().update(instance, validated_data)
-        RecipeIngredient.objects.filter(
-            recipe=instance,
-            ingredient__in=instance.ingredients.all(),
-        ).delete()
-        self.tags_and_ingredients_set(instance, tags, ingredients)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self._update_ingredients(instance, ingredients)
         logger.info("Recipe updated: %s", instance.id)
         return instance
 
     def to_representation(self, instance):
-        from .serializers import RecipeSerializer
+        view = self.context.get("view")
+        if view is not None:
+            instance = view.get_queryset().get(pk=instance.pk)
+            return RecipeSerializer(instance, context=self.context).data
+        kinds = {
+            kind
+            for _, kind in user_relation_rows(
+                self.context["request"].user,
+                [instance.pk],
+                with_subscriptions=False,
+            )
+        }
+        instance.is_favorited = "f" in kinds
+        instance.is_in_shopping_cart = "c" in kinds
         return RecipeSerializer(instance, context=self.context).data
 
 
+def short_recipes_by_author(author_ids, request, limit=None):
+    grouped = defaultdict(list)
+    if limit == 0:
+        return grouped
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is not None:
+        recipes = recipes.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("author_id"),
+                order_by=Recipe._meta.ordering,
+            )
+        ).filter(position__lte=limit)
+    storage = Recipe._meta.get_field("image").storage
+    rows = recipes.values_list(
+        "author_id", "id", "name", "image", "cooking_time"
+    )
+    for author_id, recipe_id, name, image, cooking_time in rows:
+        grouped[author_id].append(
+            {
+                "id": recipe_id,
+                "name": name,
+                "image": (
+                    absolute_url(request, storage.url(image))
+                    if image else None
+                ),
+                "cooking_time": cooking_time,
+            }
+        )
+    return grouped
+
+
+class SubscriptionsListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        authors = list(data.all() if isinstance(data, Manager) else data)
+        request = self.context.get("request")
+        grouped = short_recipes_by_author(
+            [author.pk for author in authors],
+            request,
+            self.child.recipes_limit(request),
+        )
+        for author in authors:
+            author._recipes_data = grouped.get(author.pk, [])
+        return super().to_representation(authors)
+
+
 class SubscriptionsSerializer(UserInfoSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.IntegerField(read_only=True)
@@ -445,29 +708,77 @@ class SubscriptionsSerializer(UserInfoSerializer):
             "recipes",
             "recipes_count",
         )
+        list_serializer_class = SubscriptionsListSerializer
 
-    def get_recipes(self, obj):
-        request = self.context.get("request")
-        qs = obj.recipes.all()
+    @staticmethod
+    def recipes_limit(request):
         raw = request.query_params.get("recipes_limit") if request else None
-        if raw is not None:
-            try:
-                limit = int(raw)
-                if limit < 0:
-                    raise ValueError
-                qs = qs[:limit]
-            except (ValueError, TypeError):
-                raise serializers.ValidationError(
-                    "recipes_limit должен быть неотрицательным целым числом."
-                )
-        return RecipeShortSerializer(qs, many=True, context=self.context).data
+        if raw is None:
+            return None
+        try:
+            limit = int(raw)
+        except (ValueError, TypeError):
+            limit = -1
+        if limit < 0:
+            raise serializers.ValidationError(
+                "recipes_limit должен быть неотрицательным целым числом."
+            )
+        return limit
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, user=None):
+        return (
+            super()
+            .setup_eager_loading(queryset, user)
+            .annotate(recipes_count=Count("recipes"))
+        )
 
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        data["recipes_count"] = instance.recipes.count()
+    def get_recipes(self, obj):
+        data = getattr(obj, "_recipes_data", None)
+        if data is None:
+            request = self.context.get("request")
+            data = short_recipes_by_author(
+                [obj.pk], request, self.recipes_limit(request)
+            ).get(obj.pk, [])
         return data
 
 
+def insert_unique(model, **values):
+    """Insert a row unless a unique constraint already holds it.
+
+    Returns the new instance, or None on conflict. On PostgreSQL this is a
+    single ``INSERT ... ON CONFLICT DO NOTHING RETURNING`` statement, which
+    bypasses ``save()`` and the pre_save/post_save signals; the models it
+    is used for have neither. Other backends go through get_or_create.
+    """
+    alias = router.db_for_write(model)
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        try:
+            instance, created = model.objects.using(alias).get_or_create(
+                **values
+            )
+        except IntegrityError:
+            return None
+        return instance if created else None
+
+    qn = connection.ops.quote_name
+    opts = model._meta
+    columns = ", ".join(qn(opts.get_field(name).column) for name in values)
+    placeholders = ", ".join(["%s"] * len(values))
+    sql = (
+        f"INSERT INTO {qn(opts.db_table)} ({columns}) "
+        f"VALUES ({placeholders}) ON CONFLICT DO NOTHING "
+        f"RETURNING {qn(opts.pk.column)}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    return model(pk=row[0], **values)
+
+
 class SubscribeAuthorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
@@ -479,47 +790,54 @@ class SubscribeAuthorSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 "Нельзя подписаться на себя."
             )
-        if Subscription.objects.filter(user=user, author=value).exists():
-            raise serializers.ValidationError(
-                "Вы уже подписаны на этого пользователя."
-            )
         return value
 
     def create(self, validated_data):
-        return Subscription.objects.create(
-            user=self.context["request"].user,
-            **validated_data,
+        subscription = insert_unique(
+            Subscription,
+            user_id=self.context["request"].user.pk,
+            author_id=validated_data["author"].pk,
         )
+        if subscription is None:
+            raise serializers.ValidationError(
+                {"author": ["Вы уже подписаны на этого пользователя."]}
+            )
+        return subscription
 
     def to_representation(self, instance):
-        return SubscriptionsSerializer(
-            instance.author,
-            context=self.context,
-        ).data
+        author = SubscriptionsSerializer.setup_eager_loading(
+            User.objects.filter(pk=instance.author_id)
+        ).get()
+        return SubscriptionsSerializer(author, context=self.context).data
 
 
 class _UserRecipeRelationSerializer(serializers.ModelSerializer):
     class Meta:
         model = None
         fields = ("user", "recipe")
+        validators = []
 
-    def validate(self, attrs):
+    def create(self, validated_data):
         model = self.Meta.model
-        exists = model.objects.filter(
-            user=attrs["user"],
-            recipe=attrs["recipe"],
-        ).exists()
-        if exists:
+        instance = insert_unique(
+            model,
+            user_id=validated_data["user"].pk,
+            recipe_id=validated_data["recipe"].pk,
+        )
+        if instance is None:
             raise serializers.ValidationError(
-                f"Этот рецепт уже в {model._meta.verbose_name}."
+                {
+                    "non_field_errors": [
+                        f"Этот рецепт уже в {model._meta.verbose_name}."
+                    ]
+                }
             )
-        return attrs
+        return instance
 
     def to_representation(self, instance):
-        return RecipeShortSerializer(
-            instance.recipe,
-            context=self.context,
-        ).data
+        return short_recipe_data(
+            instance.recipe, self.context.get("request")
+        )
 
 
 class FavoriteSerializer(_UserRecipeRelationSerializer):
@@ -554,10 +872,18 @@ class LoginOrEmailTokenCreateSerializer(DjoserTokenCreateSerializer):
 
         login_norm = raw_login.lower()
 
-        UserModel = get_user_model()
-        user = UserModel.objects.filter(
-            Q(email__iexact=login_norm) | Q(username__iexact=login_norm)
-        ).first()
+        users = get_user_model().objects.only(
+            "id", "password", "is_active", "email", "username"
+        )
+        user = None
+        if "@" in login_norm:
+            user = users.filter(email=login_norm).first()
+        if user is None:
+            user = (
+                users.alias(username_ci=Lower("username"))
+                .filter(username_ci=login_norm)
+                .first()
+            )
 
         if not user or not user.check_password(password):
             raise serializers.ValidationError(
@@ -573,4 +899,5 @@ class LoginOrEmailTokenCreateSerializer(DjoserTokenCreateSerializer):
             username_field,
             user.email,
         )
-        return super().validate(attrs)
+        self.user = user
+        return attrs
@@ -1,15 +1,29 @@
 from __future__ import annotations
 
 import base64
+import time
+from functools import lru_cache
 from typing import Optional
 
-from api.constants import BASE62_ALPHABET, FRONT_RECIPE_PATH
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.constants import (
+    BASE62_ALPHABET,
+    FRONT_RECIPE_PATH,
+    SHORTLINK_CACHE_SIZE,
+    SHORTLINK_CACHE_TTL,
+)
 
 
 INDEX62 = {ch: i for i, ch in enumerate(BASE62_ALPHABET)}
+_PAIRS62 = tuple(hi + lo for hi in BASE62_ALPHABET for lo in BASE62_ALPHABET)
+_BASE62_SQ = len(_PAIRS62)
+_DECODE62 = bytes(INDEX62.get(chr(i), 255) for i in range(256))
 
 __all__ = [
     "INDEX62",
+    "absolute_url",
     "encode_base62",
     "decode_base62",
     "decode_urlsafe_b64_to_int",
@@ -17,28 +31,41 @@ __all__ = [
 ]
 
 
+def absolute_url(request, url: str) -> str:
+    if request is None or url.startswith(("http://", "https://")):
+        return url
+    if not url.startswith("/") or url.startswith("//"):
+        return request.build_absolute_uri(url)
+    prefix = getattr(request, "_abs_prefix", None)
+    if prefix is None:
+        prefix = request.build_absolute_uri("/")[:-1]
+        request._abs_prefix = prefix
+    return prefix + url
+
+
 def encode_base62(n: int) -> str:
     if n < 0:
         raise ValueError("encode_base62: n must be non-negative")
-    if n == 0:
-        return BASE62_ALPHABET[0]
-    chars = []
-    while n > 0:
-        n, rem = divmod(n, 62)
-        chars.append(BASE62_ALPHABET[rem])
-    return "".join(reversed(chars))
+    if n < 62:
+        return BASE62_ALPHABET[n]
+    chunks = []
+    while n >= _BASE62_SQ:
+        n, rem = divmod(n, _BASE62_SQ)
+        chunks.append(_PAIRS62[rem])
+    chunks.append(_PAIRS62[n] if n >= 62 else BASE62_ALPHABET[n])
+    return "".join(reversed(chunks))
 
 
 def decode_base62(s: str) -> Optional[int]:
-    if not isinstance(s, str) or not s:
+    if not isinstance(s, str) or not s or not s.isascii():
         return None
-    try:
-        n = 0
-        for ch in s:
-            n = n * 62 + INDEX62[ch]
-        return n
-    except KeyError:
+    digits = s.encode("ascii").translate(_DECODE62)
+    if 255 in digits:
         return None
+    n = 0
+    for digit in digits:
+        n = n * 62 + digit
+    return n
 
 
 def decode_urlsafe_b64_to_int(s: str) -> Optional[int]:
@@ -67,33 +94,30 @@ def _import_shortlink_model():
         return None
 
 
-def _lookup_shortlink_target(code: str) -> Optional[str]:
+@lru_cache(maxsize=SHORTLINK_CACHE_SIZE)
+def _lookup_shortlink_recipe_id(
+    code: str, ttl_bucket: int
+) -> Optional[int]:
     ShortLink = _import_shortlink_model()
     if not ShortLink:
         return None
-    obj = ShortLink.objects.filter(code=code).only("target_url").first()
-    if obj and getattr(obj, "target_url", None):
-        return str(obj.target_url)
-    return None
-
-
-def _lookup_shortlink_recipe_id(code: str) -> Optional[int]:
-    ShortLink = _import_shortlink_model()
-    if not ShortLink:
-        return None
-    obj = (
+    recipe_id = (
         ShortLink.objects
         .filter(code=code)
-        .only("recipe_id")
+        .values_list("recipe_id", flat=True)
         .first()
     )
-    if obj and obj.recipe_id:
-        return int(obj.recipe_id)
-    return None
+    return int(recipe_id) if recipe_id else None
+
+
+@receiver((post_save, post_delete), sender="recipes.ShortLink")
+def reset_shortlink_cache(sender, **kwargs):
+    _lookup_shortlink_recipe_id.cache_clear()
 
 
 def _resolve_recipe_id(code: str) -> Optional[int]:
-    rid = _lookup_shortlink_recipe_id(code)
+    ttl_bucket = int(time.monotonic() // SHORTLINK_CACHE_TTL)
+    rid = _lookup_shortlink_recipe_id(code, ttl_bucket)
     if isinstance(rid, int) and rid > 0:
         return rid
     val = decode_base62(code)
@@ -112,10 +136,6 @@ def lookup_direct_url(code: str) -> Optional[str]:
     if not code:
         return None
 
-    direct = _lookup_shortlink_target(code)
-    if direct:
-        return direct
-
     recipe_id = _resolve_recipe_id(code)
     if isinstance(recipe_id, int) and recipe_id > 0:
         return FRONT_RECIPE_PATH.format(id=recipe_id)
@@ -1,8 +1,11 @@
-from django.db.models import (
-    Exists,
-    OuterRef,
-)
-from django.http import HttpResponse
+import time
+from functools import lru_cache
+
+from django.db.models import OuterRef, Sum
+from django.db.models.deletion import Collector
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
@@ -15,11 +18,14 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.constants import INGREDIENTS_CACHE_TTL
+from api.filters import IngredientFilter, RecipeFilter, tag_rows
+from api.pagination import CachedCountPagination, RecipeCursorPagination
 from api.permissions import IsAuthorOrReadOnly
 from api.serializers import (
     FavoriteSerializer,
     IngredientSerializer,
+    RECIPE_READ_COLUMNS,
     RecipeSerializer,
     RecipeCreateSerializer,
     RecipeShortSerializer,
@@ -29,8 +35,10 @@ from api.serializers import (
     SubscribeAuthorSerializer,
     SubscriptionsSerializer,
     TagSerializer,
+    USER_INFO_COLUMNS,
     UserCreateSerializer,
     UserInfoSerializer,
+    shopping_cart_size,
 )
 from api.utils import encode_base62, lookup_direct_url
 from recipes.models import (
@@ -45,14 +53,60 @@ from recipes.models import (
 from users.models import Profile, User
 
 
+def subscribed_author_ids(user):
+    if not user.is_authenticated:
+        return frozenset()
+    return frozenset(
+        Subscription.objects.filter(user=user).values_list(
+            "author_id", flat=True
+        )
+    )
+
+
+def delete_rows(model, **filters):
+    """Delete matching rows and return how many were removed.
+
+    Rows with no cascades or delete signals go out as one bare DELETE,
+    without the transaction Collector wraps around it.
+    """
+    queryset = model.objects.filter(**filters)
+    if Collector(using=queryset.db).can_fast_delete(queryset):
+        return queryset._raw_delete(queryset.db)
+    return queryset.delete()[0]
+
+
+class ValuesListMixin:
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = self.get_serializer_class().Meta.fields
+        return Response(list(queryset.values(*fields)))
+
+
+@lru_cache(maxsize=1)
+def _ingredient_rows(ttl_bucket: int) -> tuple:
+    return tuple(
+        Ingredient.objects.order_by("name", "measurement_unit").values(
+            *IngredientSerializer.Meta.fields
+        )
+    )
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_ingredient_rows(sender, **kwargs):
+    _ingredient_rows.cache_clear()
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all().order_by("id")
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(tag_rows())
+
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
@@ -65,10 +119,25 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
             return qs
         return qs.order_by("name", "measurement_unit")
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("name"):
+            return super().list(request, *args, **kwargs)
+        ttl_bucket = int(time.monotonic() // INGREDIENTS_CACHE_TTL)
+        return Response(_ingredient_rows(ttl_bucket))
+
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all().order_by("id")
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        user = None
+        if self.action in ("list", "retrieve", "me", "subscriptions"):
+            user = self.request.user
+        if self.action in ("subscriptions", "subscribe"):
+            return SubscriptionsSerializer.setup_eager_loading(qs, user)
+        return UserInfoSerializer.setup_eager_loading(qs, user)
+
     def get_permissions(self):
         if self.action in (
             "me",
@@ -104,7 +173,7 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def me(self, request):
         serializer = UserInfoSerializer(
-            request.user,
+            self.get_queryset().get(pk=request.user.pk),
             context={"request": request},
         )
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -116,13 +185,9 @@ class UserViewSet(viewsets.ModelViewSet):
         url_path="subscriptions",
     )
     def subscriptions(self, request):
-        authors = User.objects.filter(
-            followers__user=request.user
-        ).order_by("id")
+        authors = self.get_queryset().filter(followers__user=request.user)
         page = self.paginate_queryset(authors)
-        serializer = self.get_serializer(
-            page or authors, many=True, context={"request": request}
-        )
+        serializer = self.get_serializer(page or authors, many=True)
         if page is not None:
             return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
@@ -161,14 +226,13 @@ class UserViewSet(viewsets.ModelViewSet):
             )
             serializer.is_valid(raise_exception=True)
             serializer.save()
+            author.is_subscribed_flag = True
             data = SubscriptionsSerializer(
                 author, context={"request": request}
             ).data
             return Response(data, status=status.HTTP_201_CREATED)
 
-        deleted, _ = Subscription.objects.filter(
-            user=request.user, author=author
-        ).delete()
+        deleted = delete_rows(Subscription, user=request.user, author=author)
         if not deleted:
             return Response(
                 {"errors": "Подписки не было."},
@@ -207,28 +271,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            cursor_param = RecipeCursorPagination.cursor_query_param
+            if cursor_param in self.request.query_params:
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = CachedCountPagination()
+        return self._paginator
+
     def get_queryset(self):
-        user = (
-            self.request.user if self.request.user.is_authenticated else None
-        )
+        if self.action in ("list", "retrieve"):
+            recipe_columns = RECIPE_READ_COLUMNS
+        else:
+            recipe_columns = [f.name for f in Recipe._meta.concrete_fields]
         qs = (
             Recipe.objects.all()
-            .select_related("author")
-            .prefetch_related("tags", "recipe_ingredients__ingredient")
-        )
-        if user:
-            fav_exists = Favorite.objects.filter(
-                user=user, recipe=OuterRef("pk")
-            )
-            cart_exists = ShoppingCart.objects.filter(
-                user=user, recipe=OuterRef("pk")
+            .select_related("author__profile")
+            .prefetch_related("tags")
+            .only(
+                *recipe_columns,
+                *(f"author__{name}" for name in USER_INFO_COLUMNS),
             )
-            qs = qs.annotate(
-                is_favorited=Exists(fav_exists),
-                is_in_shopping_cart=Exists(cart_exists),
+            .annotate(
+                author_cart_size=shopping_cart_size(OuterRef("author_id"))
             )
+        )
+        qs = RecipeFilter.annotate_user_flags(qs, self.request.user)
         return qs.order_by("-id")
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == "list":
+            context["subscribed_ids"] = subscribed_author_ids(
+                self.request.user
+            )
+        return context
+
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeSerializer
@@ -244,7 +324,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="favorite",
     )
     def favorite(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe = get_object_or_404(
+            Recipe.objects.only(*RecipeShortSerializer.Meta.fields), pk=pk
+        )
         method = request.method.lower()
 
         if method == "post":
@@ -259,9 +341,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ).data
             return Response(data, status=status.HTTP_201_CREATED)
 
-        deleted, _ = Favorite.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
+        deleted = delete_rows(Favorite, user=request.user, recipe=recipe)
         if not deleted:
             return Response(
                 {"errors": "Этого рецепта нет в избранном."},
@@ -276,7 +356,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="shopping_cart",
     )
     def shopping_cart(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
+        recipe = get_object_or_404(
+            Recipe.objects.only(*RecipeShortSerializer.Meta.fields), pk=pk
+        )
         method = request.method.lower()
 
         if method == "post":
@@ -291,9 +373,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             ).data
             return Response(data, status=status.HTTP_201_CREATED)
 
-        deleted, _ = ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe
-        ).delete()
+        deleted = delete_rows(ShoppingCart, user=request.user, recipe=recipe)
         if not deleted:
             return Response(
                 {"errors": "Этого рецепта нет в списке покупок."},
@@ -308,8 +388,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         url_path="get-link",
     )
     def get_link(self, request, pk=None):
-        recipe = get_object_or_404(Recipe, pk=pk)
-        code = encode_base62(int(recipe.id))
+        recipe = get_object_or_404(Recipe.objects.only("id"), pk=pk)
+        code = encode_base62(recipe.id)
         short_url = request.build_absolute_uri(f"/s/{code}")
         return Response({"short-link": short_url}, status=status.HTTP_200_OK)
 
@@ -324,16 +404,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
             RecipeIngredient.objects
             .filter(recipe__shopping_recipe__user=request.user)
             .values("ingredient__name", "ingredient__measurement_unit")
-            .order_by("ingredient__name")
+            .annotate(total=Sum("amount"))
+            .order_by("ingredient__name", "ingredient__measurement_unit")
         )
-        lines = [
-            f"{it['ingredient__name']} — {it['total']} "
-            f"{it['ingredient__measurement_unit']}"
-            for it in items
-        ]
-        content = "\n".join(lines) if lines else "Список покупок пуст."
-        response = HttpResponse(
-            content, content_type="text/plain; charset=utf-8"
+
+        def lines():
+            empty = True
+            for it in items.iterator(chunk_size=500):
+                empty = False
+                yield (
+                    f"{it['ingredient__name']} — {it['total']} "
+                    f"{it['ingredient__measurement_unit']}\n"
+                )
+            if empty:
+                yield "Список покупок пуст."
+
+        response = StreamingHttpResponse(
+            lines(), content_type="text/plain; charset=utf-8"
         )
         response["Content-Disposition"] = (
             'attachment; filename="shopping_list.txt"'
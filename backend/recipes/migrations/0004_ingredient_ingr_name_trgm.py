@@ -0,0 +1,41 @@
+# Generated by Django 4.2.15 on 2026-10-15 22:17
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import django.db.models.functions.text
+
+
+INGR_NAME_TRGM = django.contrib.postgres.indexes.GinIndex(
+    django.contrib.postgres.indexes.OpClass(
+        django.db.models.functions.text.Upper('name'),
+        name='gin_trgm_ops',
+    ),
+    name='ingr_name_trgm',
+)
+
+
+def add_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('recipes', 'Ingredient')
+    schema_editor.add_index(model, INGR_NAME_TRGM)
+
+
+def remove_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('recipes', 'Ingredient')
+    schema_editor.remove_index(model, INGR_NAME_TRGM)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_alter_shoppingcart_options_and_more'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_trgm_index, remove_trgm_index),
+    ]
@@ -39,6 +39,12 @@ class User(AbstractUser):
         verbose_name = "Пользователь"
         verbose_name_plural = "Пользователи"
         ordering = ["id"]
+        indexes = [
+            models.Index(
+                Lower("username"),
+                name="user_username_lci_idx",
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 Lower("email"),